@@ -0,0 +1,322 @@
+"""Admission control for the chat endpoint.
+
+Two layers sit in front of the model call:
+
+* token buckets keyed per session and per client IP, so one noisy client
+  cannot drain the shared Gemini quota;
+* a priority gate that caps in-flight model calls per worker and serves
+  waiting requests by priority (lower number first), rejecting right away
+  when the wait line is full instead of letting requests pile up.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Priorities for the /ask branches (lower is served first); emergencies
+# never reach the gate
+PRIORITY_HIGH = 1      # symptoms, medicines, mental health
+PRIORITY_NORMAL = 2    # nutrition / lifestyle, general chat
+PRIORITY_LOW = 3       # quizzes and tips
+
+
+def take_token(tokens, updated, capacity, refill_rate, now):
+    """Returns (tokens after taking one if possible, seconds to wait, time the bucket is full again)."""
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    wait = 0.0
+    if tokens >= 1:
+        tokens -= 1
+    else:
+        wait = (1 - tokens) / refill_rate
+    return tokens, wait, now + (capacity - tokens) / refill_rate
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process only.
+
+    A bucket that has refilled to capacity is the same as no bucket, so
+    those are dropped as they come up; the store is also an LRU capped at
+    max_entries, since keys come from the request.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at, full_at), LRU order
+
+    def take(self, key, capacity, refill_rate, now=None):
+        """Take one token. Returns seconds to wait (0.0 when allowed)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens, wait, full_at = take_token(tokens, updated, capacity, refill_rate, now)
+            self._buckets[key] = (tokens, now, full_at)
+            self._buckets.move_to_end(key)
+            # Least recently used first: drop buckets that are full again,
+            # then anything over the cap
+            while self._buckets:
+                oldest_key, (_, _, oldest_full_at) = next(iter(self._buckets.items()))
+                if oldest_full_at > now and len(self._buckets) <= self.max_entries:
+                    break
+                del self._buckets[oldest_key]
+            return wait
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, shared by every worker on the host.
+
+    Rows for buckets that have refilled to capacity are deleted on each
+    take, so the table only holds clients that are currently limited.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        try:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(buckets)")]
+            if columns and "full_at" not in columns:
+                # Buckets are soft state; a table from an older layout is just recreated
+                conn.execute("DROP TABLE buckets")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def take(self, key, capacity, refill_rate, now=None):
+        """Take one token. Returns seconds to wait (0.0 when allowed)."""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front so read-modify-write is atomic
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait, full_at = take_token(tokens, updated, capacity, refill_rate, now)
+            conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, full_at),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    """Per-session and per-IP token buckets over a shared store."""
+
+    def __init__(self, store, session_capacity, session_rate, ip_capacity, ip_rate):
+        self.store = store
+        self.session_capacity = session_capacity
+        self.session_rate = session_rate
+        self.ip_capacity = ip_capacity
+        self.ip_rate = ip_rate
+
+    def check(self, session_id, client_ip):
+        """Return seconds the caller must wait; 0.0 means the request is admitted.
+
+        The IP bucket is only debited once the session is admitted, so a
+        limited session that keeps retrying cannot drain the budget of
+        everyone else behind the same address. Either key may be None to
+        skip that bucket.
+        """
+        if session_id:
+            wait = self.store.take(f"sid:{session_id}", self.session_capacity, self.session_rate)
+            if wait > 0:
+                return wait
+        if client_ip:
+            return self.store.take(f"ip:{client_ip}", self.ip_capacity, self.ip_rate)
+        return 0.0
+
+
+class PriorityGate:
+    """Bounded priority queue in front of the model call.
+
+    The gate is per process and only orders requests that are waiting in
+    the same process at the same time. Under single-threaded gunicorn sync
+    workers it never sees more than one request; run with --threads (or the
+    ASGI entry point) for it to have any effect.
+    """
+
+    def __init__(self, max_inflight, max_waiting, wait_timeout):
+        self.max_inflight = max_inflight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._waiting = []  # heap of (priority, seq)
+        self._bumped = set()
+        self._seq = itertools.count()
+
+    def acquire(self, priority):
+        """Wait for a model slot. Returns False when overloaded or timed out."""
+        with self._cond:
+            if self._inflight < self.max_inflight and not self._waiting:
+                self._inflight += 1
+                return True
+            if len(self._waiting) >= self.max_waiting:
+                if not self._waiting:
+                    return False  # MODEL_MAX_WAITING=0: no wait line at all
+                # A full line turns away the newcomer unless it outranks the
+                # least urgent waiter, which is then bumped out instead
+                worst = max(self._waiting)
+                if priority >= worst[0]:
+                    return False
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                self._bumped.add(worst)
+                self._cond.notify_all()
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            deadline = time.monotonic() + self.wait_timeout
+            while True:
+                if entry in self._bumped:
+                    self._bumped.discard(entry)
+                    return False
+                if self._waiting[0] == entry and self._inflight < self.max_inflight:
+                    heapq.heappop(self._waiting)
+                    self._inflight += 1
+                    self._cond.notify_all()
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+
+    def release(self):
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Rough seconds until a slot frees up, for the Retry-After header."""
+        return max(1, math.ceil(self.wait_timeout))
+
+
+class AsyncPriorityGate:
+    """asyncio version of PriorityGate for the ASGI path (one per event loop)."""
+
+    def __init__(self, max_inflight, max_waiting, wait_timeout):
+        self.max_inflight = max_inflight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._cond = asyncio.Condition()
+        self._inflight = 0
+        self._waiting = []  # heap of (priority, seq)
+        self._bumped = set()
+        self._seq = itertools.count()
+
+    async def acquire(self, priority):
+        """Wait for a model slot. Returns False when overloaded or timed out."""
+        async with self._cond:
+            if self._inflight < self.max_inflight and not self._waiting:
+                self._inflight += 1
+                return True
+            if len(self._waiting) >= self.max_waiting:
+                if not self._waiting:
+                    return False
+                worst = max(self._waiting)
+                if priority >= worst[0]:
+                    return False
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                self._bumped.add(worst)
+                self._cond.notify_all()
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            deadline = time.monotonic() + self.wait_timeout
+            while True:
+                if entry in self._bumped:
+                    self._bumped.discard(entry)
+                    return False
+                if self._waiting[0] == entry and self._inflight < self.max_inflight:
+                    heapq.heappop(self._waiting)
+                    self._inflight += 1
+                    self._cond.notify_all()
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    return False
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self):
+        async with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Rough seconds until a slot frees up, for the Retry-After header."""
+        return max(1, math.ceil(self.wait_timeout))
+
+
+def build_rate_limiter():
+    """Build the limiter from environment settings.
+
+    RATE_LIMIT_BACKEND=sqlite shares buckets across gunicorn workers through
+    RATE_LIMIT_DB; the default keeps them in memory, at most
+    RATE_LIMIT_MAX_BUCKETS of them.
+    """
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        db_path = os.getenv("RATE_LIMIT_DB", os.path.join(os.path.dirname(__file__), "rate_limit.db"))
+        store = SQLiteBucketStore(db_path)
+    else:
+        store = MemoryBucketStore(max_entries=int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "10000")))
+    return RateLimiter(
+        store,
+        session_capacity=float(os.getenv("RATE_LIMIT_SESSION_BURST", "5")),
+        session_rate=float(os.getenv("RATE_LIMIT_SESSION_PER_MIN", "20")) / 60.0,
+        ip_capacity=float(os.getenv("RATE_LIMIT_IP_BURST", "20")),
+        ip_rate=float(os.getenv("RATE_LIMIT_IP_PER_MIN", "60")) / 60.0,
+    )
+
+
+def build_priority_gate():
+    """Build the model-call gate from environment settings.
+
+    The wait line is kept short so an overloaded worker answers 429 within
+    a couple of seconds instead of holding threads on queued requests.
+    """
+    return PriorityGate(
+        max_inflight=int(os.getenv("MODEL_MAX_INFLIGHT", "4")),
+        max_waiting=int(os.getenv("MODEL_MAX_WAITING", "4")),
+        wait_timeout=float(os.getenv("MODEL_WAIT_TIMEOUT", "2")),
+    )
+
+
+def build_async_priority_gate():
+    """Gate for the ASGI path, where one process can hold many more calls."""
+    return AsyncPriorityGate(
+        max_inflight=int(os.getenv("MODEL_MAX_INFLIGHT_ASYNC", "256")),
+        max_waiting=int(os.getenv("MODEL_MAX_WAITING", "4")),
+        wait_timeout=float(os.getenv("MODEL_WAIT_TIMEOUT", "2")),
+    )
@@ -1,10 +1,17 @@
-from flask import Flask, render_template, request, jsonify, session, send_from_directory
+from flask import Flask, render_template, request, jsonify, session, send_from_directory, g
 import google.generativeai as genai
-import os, json, datetime
+import os, json, datetime, math, time, asyncio, threading
 from google_trans_new import google_translator
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 import traceback
+from admission import (
+    build_rate_limiter, build_priority_gate, build_async_priority_gate,
+    PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW,
+)
+from recorder import build_recorder, RecordingModel, RecordingTranslator
+from weather import build_weather_service, WEATHER_TIPS
 
 # --- Unified data files & helpers (replace older USERDATAFILE / load_userdata/save_userdata) ---
 import uuid  # used for appointments
@@ -42,20 +49,45 @@ translate_client = google_translator()
 # Initialize Flask
 app = Flask(__name__, static_folder='static')
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "supersecret")  # Needed for session
-CORS(app)  # Allow all origins
-
-# Google API Key
+# Number of reverse proxies (e.g. the platform router) whose X-Forwarded-For
+# is trusted; 0 when clients connect directly. Left unset, remote_addr may be
+# the router for every client, so the per-IP rate limit stays off rather
+# than becoming one global cap.
+RATE_LIMIT_BY_IP = bool(os.getenv("TRUSTED_PROXY_HOPS", "").strip())
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS") or "0")
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+if not RATE_LIMIT_BY_IP:
+    print("ℹ️ TRUSTED_PROXY_HOPS is not set; per-IP rate limiting is off.")
+# Comma-separated allow-list; defaults to all origins
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()]
+CORS(app, origins=CORS_ORIGINS)
+
+# Admission control for /ask (see admission.py)
+rate_limiter = build_rate_limiter()
+model_gate = build_priority_gate()
+async_model_gate = build_async_priority_gate()
+
+# Optional model/translator call recording and offline replay (see recorder.py)
+model_recorder = build_recorder()
+
+# Google API Key (not needed when replaying a recording)
 API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
+if not API_KEY and not (model_recorder and model_recorder.replaying):
     raise ValueError("⚠️ GOOGLE_API_KEY is not set.")
 
-# Weather API mock key
-WEATHER_API_KEY = "your_weather_api_key"
+# Weather tips: pluggable provider behind a per-city cache (see weather.py)
+weather_service = build_weather_service()
 
 # Configure Generative AI
 genai.configure(api_key=API_KEY)
 model = genai.GenerativeModel("gemini-1.5-flash")
 vision_model = genai.GenerativeModel("gemini-1.5-flash")
+if model_recorder:
+    # Only used for chat turns (start_chat, and directly by the async path)
+    model = RecordingModel(model, model_recorder, kind="chat")
+    vision_model = RecordingModel(vision_model, model_recorder, kind="vision")
+    translate_client = RecordingTranslator(translate_client, model_recorder)
 
 LOG_FILE = os.path.join(os.path.dirname(__file__), "chat_log.json")
 
@@ -93,6 +125,35 @@ if not os.path.exists(LOG_FILE):
         json.dump([], f)
 
 USER_DATA_FILE = "user_data.json"
+chat_log_lock = threading.Lock()
+
+EMERGENCY_KEYWORDS = ["chest pain", "shortness of breath", "accident", "bleeding", "heart attack"]
+AI_ERROR_REPLY = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+BUSY_REPLY = "I'm getting a lot of messages right now. Please try again in a moment."
+FAILURE_REPLY = "I'm sorry, I'm experiencing technical difficulties. Please try again later."
+EMERGENCY_MESSAGE = (
+    "⚠️ Emergency detected!\n"
+    "Please call 108 immediately for an ambulance.\n"
+    "You are HealthBot, a friendly AI assistant. "
+    "The user is in an emergency. "
+    "Provide **3 emergency situation tips** based on the input, each 1-2 sentences. "
+    "Do not repeat previous tips. "
+    "Add a friendly tone and include a disclaimer: "
+    "'This is general advice, not a substitute for professional help.'"
+)
+
+
+# Translated EMERGENCY_MESSAGE per language: lang -> (message, valid until)
+emergency_replies = {}
+EMERGENCY_RETRY_SECONDS = 60
+
+
+def too_many_requests(retry_after):
+    """429 response with a Retry-After header (whole seconds)."""
+    response = jsonify({"reply": BUSY_REPLY})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
 
 
 def update_log(edit_id: str, user_input: str, bot_text: str):
@@ -183,18 +244,237 @@ def create_system_instruction(user_data):
     return instruction
 
 
+def build_chat_prompt(user_input_en, system_instruction):
+    """Pick the prompt branch for a message. Returns (label, priority, prompt)."""
+    # Priority-ordered checks (mutually exclusive via elif)
+    # 1) Mental health
+    mental_keywords = ["stress", "anxious", "depressed", "sad", "low mood"]
+    if any(k in user_input_en.lower() for k in mental_keywords):
+        label, priority = "mental", PRIORITY_HIGH
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user is feeling stressed or anxious. "
+            "Provide **3 practical mental health tips** based on the input, each 1-2 sentences. "
+            "Do not repeat previous tips. "
+            "Add a friendly tone and include a disclaimer: "
+            "'This is general advice, not a substitute for professional help.'"
+            f"\nUser input: {user_input_en}"
+        )
+    elif any(word in user_input_en.lower() for word in ["diet", "food", "nutrition", "exercise", "diabetic"]):
+        label, priority = "nutrition", PRIORITY_NORMAL
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user asked about nutrition or healthy lifestyle. "
+            "Provide **3 practical tips** based on the input. "
+            "Include simple advice suitable for everyday life. "
+            "Add a friendly disclaimer: 'This is general advice, not a substitute for professional help.'"
+            f"\nUser input: {user_input_en}"
+        )
+    elif "quiz" in user_input_en.lower() or "tip" in user_input_en.lower():
+        label, priority = "quiz/tip", PRIORITY_LOW
+        prompt = (
+            "You are HealthBot. Provide a **new health quiz question or tip** for the user. "
+            "Keep it engaging, educational, and safe. "
+            "Do not repeat previous questions. "
+            "Add a short disclaimer if necessary."
+            f"\nUser input: {user_input_en}"
+        )
+    elif any(word in user_input_en.lower() for word in ["medicine", "drug", "tablet", "capsule", "paracetamol", "ibuprofen"]):
+        label, priority = "medicine", PRIORITY_HIGH
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user is asking about a medicine. "
+            "Provide general information about the medicine: common uses, typical dosage ranges (if applicable), common side effects, and precautions. "
+            "Keep answers concise (1-2 sentences per item) and include the disclaimer: 'This is general advice, not a substitute for professional help.'"
+            f"\nUser question: {user_input_en}"
+        )
+    elif "symptom" in user_input_en.lower() or any(symptom_word in user_input_en.lower() for symptom_word in ["fever", "headache", "cough", "nausea", "fatigue"]):
+        label, priority = "symptoms", PRIORITY_HIGH
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user described symptoms and wants possible causes and safe home remedies. "
+            "Provide a short list of possible general causes (not diagnoses) and safe at-home measures they can try. "
+            "Add the disclaimer: 'This is general advice, not a substitute for professional help.'"
+            f"\nUser symptoms: {user_input_en}"
+        )
+    else:
+        label, priority = "default", PRIORITY_NORMAL
+        prompt = f"User: {user_input_en}\nHealthBot instructions: {system_instruction}"
+    return label, priority, prompt
+
+
+def is_emergency(text):
+    return any(word in text.lower() for word in EMERGENCY_KEYWORDS)
+
+
+def check_chat_admission():
+    """Per-session / per-IP admission; returns a 429 response or None.
+
+    Runs before any translator or model call. A request without the session
+    cookie gets one, but is only held to the per-IP bucket: a client that
+    drops the cookie would otherwise start a fresh bucket every time.
+    """
+    session_id = session.get("sid")
+    if session_id is None:
+        session["sid"] = uuid.uuid4().hex
+    client_ip = request.remote_addr if RATE_LIMIT_BY_IP else None
+    retry_after = rate_limiter.check(session_id, client_ip)
+    if retry_after > 0:
+        return too_many_requests(retry_after)
+    return None
+
+
+def log_chat_turn(edit_id, user_input, bot_text):
+    # Both writers read-modify-write chat_log.json; keep concurrent turns apart
+    with chat_log_lock:
+        if edit_id:
+            update_log(edit_id, user_input, bot_text)
+        else:
+            save_message(user_input, bot_text)
+
+
+# The helpers below hold the /ask and /image_to_text steps shared by the
+# sync views and their async twins; the views only differ in how they wait.
+def parse_chat_request():
+    """Returns (user_input, edit_id, lang) for an /ask request."""
+    user_input = request.json.get("message", "").strip()
+    incoming_edit_id = request.json.get("edit_id")
+    edit_id = str(incoming_edit_id) if incoming_edit_id else None
+    return user_input, edit_id, session.get("lang", "en")
+
+
+def translate_input(user_input, lang):
+    """Translate input to English if session language is not English."""
+    if lang == "en" or not user_input:
+        return user_input
+    try:
+        # The google_translator library returns a string directly
+        return translate_client.translate(user_input, lang_tgt="en")
+    except Exception as e:
+        print(f"Translation error (to en): {e}")
+        traceback.print_exc()
+        return user_input  # Fallback
+
+
+def emergency_reply(lang):
+    """EMERGENCY_MESSAGE in the session language, translated once per language."""
+    if lang != "te":
+        return EMERGENCY_MESSAGE
+    message, valid_until = emergency_replies.get(lang, (None, 0))
+    if time.monotonic() < valid_until:
+        return message
+    try:
+        result = translate_client.translate(
+            EMERGENCY_MESSAGE, target_language='te'
+        )
+        emergency_replies[lang] = (result["translatedText"], math.inf)
+    except Exception as e:
+        print(f"Emergency translation error: {e}")
+        traceback.print_exc()
+        # Serve English until the next retry instead of calling out every time
+        emergency_replies[lang] = (EMERGENCY_MESSAGE, time.monotonic() + EMERGENCY_RETRY_SECONDS)
+    return emergency_replies[lang][0]
+
+
+def translate_reply(bot_text, lang):
+    """Translate bot_text to Telugu if needed (done once at end)."""
+    if lang == "te":
+        try:
+            result = translate_client.translate(
+                bot_text, target_language='te'
+            )
+            bot_text = result["translatedText"]
+        except Exception as e:
+            print(f"Translation error (to te): {e}")
+            traceback.print_exc()
+    return bot_text
+
+
+def model_reply(response):
+    return response.text or "Sorry — I couldn't generate a response right now."
+
+
+def model_error_reply(label, e):
+    print(f"AI response error ({label}): {e}")
+    traceback.print_exc()
+    return AI_ERROR_REPLY
+
+
+def generate_reply(label, priority, prompt):
+    """Send prompt once a model slot is free; None when the gate turns it away."""
+    # More urgent branches jump the line
+    if not model_gate.acquire(priority):
+        return None
+    try:
+        return model_reply(chat.send_message(prompt))
+    except Exception as e:
+        return model_error_reply(label, e)
+    finally:
+        model_gate.release()
+
+
+async def send_chat_message_async(prompt):
+    """One chat turn for the async path; returns the reply text.
+
+    ChatSession.send_message_async is not safe to run concurrently: turns
+    that overlap overwrite each other's history. The async path keeps the
+    history itself instead, sending a snapshot plus the new message and
+    appending the finished turn as a pair. Neither step awaits in between,
+    so on the event loop no other turn can interleave with it.
+    """
+    content = {"role": "user", "parts": [prompt]}
+    response = await model.generate_content_async(async_chat_history + [content])
+    bot_text = model_reply(response)
+    async_chat_history.extend([content, {"role": "model", "parts": [bot_text]}])
+    return bot_text
+
+
+async def generate_reply_async(label, priority, prompt):
+    """Same as generate_reply(), awaiting the async gate and Gemini call."""
+    if not await async_model_gate.acquire(priority):
+        return None
+    try:
+        return await send_chat_message_async(prompt)
+    except Exception as e:
+        return model_error_reply(label, e)
+    finally:
+        await async_model_gate.release()
+
+
+def profile_city():
+    """Location/city from the saved profile, lower-cased ('' when unset)."""
+    user = load_user_data()
+    return (user.get("profile", {}).get("location") or user.get("profile", {}).get("city") or "").strip().lower()
+
+
 # Initialize Chat
 user_data = load_user_data()
-chat = model.start_chat(
-    history=[
-        {"role": "user", "parts": [create_system_instruction(user_data)]},
-        {"role": "model", "parts": ["I understand my purpose. I'm ready to help!"]}
-    ]
-)
+chat_primer = [
+    {"role": "user", "parts": [create_system_instruction(user_data)]},
+    {"role": "model", "parts": ["I understand my purpose. I'm ready to help!"]}
+]
+chat = model.start_chat(history=chat_primer)
+# History for the async path (see send_chat_message_async)
+async_chat_history = list(chat_primer)
+
+# Warm the weather cache for the saved location
+weather_service.prefetch(profile_city())
 
 # ---------------------------
 # Routes
 # ---------------------------
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """End-to-end latency per request, when recording is enabled."""
+    if model_recorder and "request_started" in g:
+        elapsed_ms = (time.perf_counter() - g.request_started) * 1000
+        model_recorder.log_request(request.path, response.status_code, elapsed_ms)
+    return response
+
 @app.route("/")
 def home():
     return render_template("index.html")
@@ -202,173 +482,38 @@ def home():
 @app.route("/ask", methods=["POST"])
 def ask():
     try:
-        user_input = request.json.get("message", "").strip()
-        incoming_edit_id = request.json.get("edit_id")
-        edit_id = str(incoming_edit_id) if incoming_edit_id else None
-
-        current_user_data = load_user_data()
-        system_instruction = create_system_instruction(current_user_data)
-        lang = session.get("lang", "en")
-
-        # Translate input to English if session language is not English
-        if lang != "en" and user_input:
-            try:
-                # The google_translator library returns a string directly
-                result = translate_client.translate(
-                    user_input, lang_tgt="en"
-                )
-                user_input_en = result
-            except Exception as e:
-                print(f"Translation error (to en): {e}")
-                traceback.print_exc()
-                user_input_en = user_input  # Fallback
-        else:
-            user_input_en = user_input
-
-        # ... (rest of your logic for emergency, mental health, etc.) ...
-        # (This section remains unchanged, as it correctly uses user_input_en)
-
-        # Emergency check (immediate return)
-        emergency_keywords = ["chest pain", "shortness of breath", "accident", "bleeding", "heart attack"]
-        if any(word in user_input_en.lower() for word in emergency_keywords):
-            emergency_message = (
-                "⚠️ Emergency detected!\n"
-                "Please call 108 immediately for an ambulance.\n"
-                "You are HealthBot, a friendly AI assistant. "
-                "The user is in an emergency. "
-                "Provide **3 emergency situation tips** based on the input, each 1-2 sentences. "
-                "Do not repeat previous tips. "
-                "Add a friendly tone and include a disclaimer: "
-                "'This is general advice, not a substitute for professional help.'"
-            )
-            if lang == "te":
-                try:
-                    result = translate_client.translate(
-                        emergency_message, target_language='te'
-                    )
-                    emergency_message = result["translatedText"]
-                except Exception as e:
-                    print(f"Emergency translation error: {e}")
-                    traceback.print_exc()
-            return jsonify({"reply": emergency_message})
-
-
-        # ... (rest of your existing code for other prompts) ...
-        bot_text = ""
-        # Priority-ordered checks (mutually exclusive via elif)
-        # 1) Mental health
-        mental_keywords = ["stress", "anxious", "depressed", "sad", "low mood"]
-        if any(k in user_input_en.lower() for k in mental_keywords):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user is feeling stressed or anxious. "
-                "Provide **3 practical mental health tips** based on the input, each 1-2 sentences. "
-                "Do not repeat previous tips. "
-                "Add a friendly tone and include a disclaimer: "
-                "'This is general advice, not a substitute for professional help.'"
-                f"\nUser input: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (mental): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        elif any(word in user_input_en.lower() for word in ["diet", "food", "nutrition", "exercise", "diabetic"]):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user asked about nutrition or healthy lifestyle. "
-                "Provide **3 practical tips** based on the input. "
-                "Include simple advice suitable for everyday life. "
-                "Add a friendly disclaimer: 'This is general advice, not a substitute for professional help.'"
-                f"\nUser input: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (nutrition): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        elif "quiz" in user_input_en.lower() or "tip" in user_input_en.lower():
-            prompt = (
-                "You are HealthBot. Provide a **new health quiz question or tip** for the user. "
-                "Keep it engaging, educational, and safe. "
-                "Do not repeat previous questions. "
-                "Add a short disclaimer if necessary."
-                f"\nUser input: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (quiz/tip): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        elif any(word in user_input_en.lower() for word in ["medicine", "drug", "tablet", "capsule", "paracetamol", "ibuprofen"]):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user is asking about a medicine. "
-                "Provide general information about the medicine: common uses, typical dosage ranges (if applicable), common side effects, and precautions. "
-                "Keep answers concise (1-2 sentences per item) and include the disclaimer: 'This is general advice, not a substitute for professional help.'"
-                f"\nUser question: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (medicine): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        elif "symptom" in user_input_en.lower() or any(symptom_word in user_input_en.lower() for symptom_word in ["fever", "headache", "cough", "nausea", "fatigue"]):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user described symptoms and wants possible causes and safe home remedies. "
-                "Provide a short list of possible general causes (not diagnoses) and safe at-home measures they can try. "
-                "Add the disclaimer: 'This is general advice, not a substitute for professional help.'"
-                f"\nUser symptoms: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (symptoms): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        else:
-            formatted_input = f"User: {user_input_en}\nHealthBot instructions: {system_instruction}"
-            try:
-                response = chat.send_message(formatted_input)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (default): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        
+        user_input, edit_id, lang = parse_chat_request()
 
-        # Translate bot_text to Telugu if needed (done once at end)
-        if lang == "te":
-            try:
-                result = translate_client.translate(
-                    bot_text, target_language='te'
-                )
-                bot_text = result["translatedText"]
-            except Exception as e:
-                print(f"Translation error (to te): {e}")
-                traceback.print_exc()
+        # An emergency in the user's own words is answered before admission
+        # and without translating the input
+        if is_emergency(user_input):
+            return jsonify({"reply": emergency_reply(lang)})
 
-        if edit_id:
-            update_log(edit_id, user_input, bot_text)
-        else:
-            save_message(user_input, bot_text)
+        # Per-session / per-IP admission before spending translator or model quota
+        rejected = check_chat_admission()
+        if rejected is not None:
+            return rejected
 
+        system_instruction = create_system_instruction(load_user_data())
+        user_input_en = translate_input(user_input, lang)
+
+        # Emergency only recognisable after translation (immediate return)
+        if is_emergency(user_input_en):
+            return jsonify({"reply": emergency_reply(lang)})
+
+        label, priority, prompt = build_chat_prompt(user_input_en, system_instruction)
+        bot_text = generate_reply(label, priority, prompt)
+        if bot_text is None:
+            return too_many_requests(model_gate.retry_after())
+
+        bot_text = translate_reply(bot_text, lang)
+        log_chat_turn(edit_id, user_input, bot_text)
         return jsonify({"reply": bot_text})
 
     except Exception as e:
         print(f"Error in ask route: {e}")
         traceback.print_exc()
-        return jsonify({"reply": "I'm sorry, I'm experiencing technical difficulties. Please try again later."}), 500
+        return jsonify({"reply": FAILURE_REPLY}), 500
     
 def save_message(user_input, bot_text):
     try:
@@ -407,6 +552,7 @@ def save_profile():
     profile_data = request.json
     data["profile"] = profile_data
     save_user_data(data)
+    weather_service.prefetch(profile_city())
     return jsonify({"status": "success", "message": "Profile saved!"})
 
 
@@ -584,27 +730,19 @@ def clear_chat():
 
 @app.route("/get_weather_tip", methods=["GET"])
 def get_weather_tip():
-    """Fetches weather data for a location and provides a relevant health tip."""
-    tips = {
-        'Clear': "It's a beautiful day! Go for a walk and get some natural sunlight. It's great for your mood and Vitamin D.",
-        'Clouds': "A cloudy day is perfect for an indoor workout. Try some light stretches or yoga to stay active.",
-        'Rain': "Stay indoors and hydrate! A warm cup of herbal tea can be very comforting on a rainy day.",
-        'Snow': "If you're going out, remember to bundle up in layers to stay warm. A hot, nutritious soup is a great way to warm up afterwards.",
-        'Mist': "Visibility is low. If you're driving, be extra careful. Inside, take some time for mindfulness and deep breathing.",
-        'default': "The weather is changing. Remember to drink plenty of water and eat a balanced meal to keep your immune system strong."
-    }
-
+    """Health tip for the current weather at a location.
+    Query params:
+      - location: string (optional, fallback to profile location if present)
+    """
     try:
-        # Mocking a real weather API call for a simple example.
-        # In a real app, you would use a service like OpenWeatherMap
-        # and get the user's location.
-        mock_weather_data = {'weather': [{'main': 'Clear'}]}
-        condition = mock_weather_data['weather'][0]['main']
-        tip = tips.get(condition, tips['default'])
-        return jsonify({"tip": tip})
+        location = (request.args.get("location") or request.args.get("city") or "").strip().lower()
+        if not location:
+            location = profile_city()
+        condition, tip = weather_service.get_tip(location)
+        return jsonify({"tip": tip, "condition": condition, "location": location})
     except Exception as e:
         print(f"Error fetching weather data: {e}")
-        return jsonify({"tip": tips['default']}), 500
+        return jsonify({"tip": WEATHER_TIPS['default']}), 500
 
 @app.route("/find_doctors", methods=["GET"])
 def find_doctors():
@@ -622,9 +760,7 @@ def find_doctors():
 
         # Fallback to user profile location if not provided
         if not location:
-            user = load_user_data()
-            profile_loc = (user.get("profile", {}).get("location") or user.get("profile", {}).get("city") or "").strip().lower()
-            location = profile_loc
+            location = profile_city()
 
         matches = []
         for doc in DOCTOR_DIRECTORY:
@@ -644,6 +780,63 @@ def find_doctors():
 # ---------------------------
 # OCR: Image to text
 # ---------------------------
+OCR_PROMPT = (
+    "Extract all readable text from this image."
+    " If the image contains tables or receipts, read line-by-line in natural order."
+    " Return plain text only, no extra commentary."
+)
+
+
+def save_uploaded_image(file):
+    """Persist an uploaded image; returns (content, safe_filename)."""
+    original_filename = secure_filename(file.filename or "uploaded_image")
+    timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    base, ext = os.path.splitext(original_filename)
+    safe_filename = f"{base}_{timestamp_str}{ext or '.bin'}"
+    saved_path = os.path.join(UPLOAD_DIR, safe_filename)
+    content = file.read()
+    with open(saved_path, "wb") as out_f:
+        out_f.write(content)
+    return content, safe_filename
+
+
+def ocr_request(file, content):
+    """Gemini expects inline data parts for images."""
+    return [
+        {"text": OCR_PROMPT},
+        {"inline_data": {"mime_type": file.mimetype or "image/jpeg", "data": content}},
+    ]
+
+
+def extract_image_text(file, content):
+    try:
+        response = vision_model.generate_content(ocr_request(file, content))
+        return (response.text or "").strip()
+    except Exception as e:
+        print(f"Vision API error: {e}")
+        return ""
+
+
+async def extract_image_text_async(file, content):
+    try:
+        response = await vision_model.generate_content_async(ocr_request(file, content))
+        return (response.text or "").strip()
+    except Exception as e:
+        print(f"Vision API error: {e}")
+        return ""
+
+
+def image_text_response(extracted, safe_filename):
+    # Public URL path for the saved file (served by /uploads/<filename>)
+    file_location = f"/uploads/{safe_filename}"
+    return jsonify({"text": extracted or "", "location": file_location})
+
+
+def image_to_text_failed(e):
+    print(f"/image_to_text error: {e}")
+    return jsonify({"error": "Failed to process image"}), 500
+
+
 @app.route("/image_to_text", methods=["POST"])
 def image_to_text():
     try:
@@ -652,44 +845,13 @@ def image_to_text():
 
         file = request.files['image']
         # Persist the uploaded file to disk
-        original_filename = secure_filename(file.filename or "uploaded_image")
-        timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        base, ext = os.path.splitext(original_filename)
-        safe_filename = f"{base}_{timestamp_str}{ext or '.bin'}"
-        saved_path = os.path.join(UPLOAD_DIR, safe_filename)
-        content = file.read()
-        with open(saved_path, "wb") as out_f:
-            out_f.write(content)
+        content, safe_filename = save_uploaded_image(file)
         if not content:
             return jsonify({"error": "Empty file"}), 400
 
-        # Gemini expects inline data parts for images
-        parts = [
-            {"mime_type": file.mimetype or "image/jpeg", "data": content}
-        ]
-
-        prompt = (
-            "Extract all readable text from this image."
-            " If the image contains tables or receipts, read line-by-line in natural order."
-            " Return plain text only, no extra commentary."
-        )
-
-        try:
-            response = vision_model.generate_content([
-                {"text": prompt},
-                {"inline_data": parts[0]}
-            ])
-            extracted = (response.text or "").strip()
-        except Exception as e:
-            print(f"Vision API error: {e}")
-            extracted = ""
-
-        # Public URL path for the saved file (served by /uploads/<filename>)
-        file_location = f"/uploads/{safe_filename}"
-        return jsonify({"text": extracted or "", "location": file_location})
+        return image_text_response(extract_image_text(file, content), safe_filename)
     except Exception as e:
-        print(f"/image_to_text error: {e}")
-        return jsonify({"error": "Failed to process image"}), 500
+        return image_to_text_failed(e)
     
 # In your app.py file
 @app.route("/translate", methods=["POST"])
@@ -719,6 +881,61 @@ def clear_chat_history():
     if 'chat_history' in session:
         session.pop('chat_history', None)
     return '', 204  # Return a No Content response to indicate success
+# ---------------------------
+# Async views (served by asgi.py under an ASGI server)
+# ---------------------------
+async def ask_async():
+    """Same steps as ask(); blocking work (files, SQLite, translator) runs off the event loop."""
+    try:
+        user_input, edit_id, lang = parse_chat_request()
+
+        if is_emergency(user_input):
+            return jsonify({"reply": await asyncio.to_thread(emergency_reply, lang)})
+
+        rejected = await asyncio.to_thread(check_chat_admission)
+        if rejected is not None:
+            return rejected
+
+        system_instruction = create_system_instruction(await asyncio.to_thread(load_user_data))
+        # google_trans_new has no async API, so translation also runs in a thread
+        user_input_en = await asyncio.to_thread(translate_input, user_input, lang)
+
+        if is_emergency(user_input_en):
+            return jsonify({"reply": await asyncio.to_thread(emergency_reply, lang)})
+
+        label, priority, prompt = build_chat_prompt(user_input_en, system_instruction)
+        bot_text = await generate_reply_async(label, priority, prompt)
+        if bot_text is None:
+            return too_many_requests(async_model_gate.retry_after())
+
+        bot_text = await asyncio.to_thread(translate_reply, bot_text, lang)
+        await asyncio.to_thread(log_chat_turn, edit_id, user_input, bot_text)
+        return jsonify({"reply": bot_text})
+
+    except Exception as e:
+        print(f"Error in ask route: {e}")
+        traceback.print_exc()
+        return jsonify({"reply": FAILURE_REPLY}), 500
+
+
+async def image_to_text_async():
+    """Same steps as image_to_text()."""
+    try:
+        # Multipart parsing and the upload write are blocking; keep them off the loop
+        files = await asyncio.to_thread(lambda: request.files)
+        if 'image' not in files:
+            return jsonify({"error": "No image provided"}), 400
+
+        file = files['image']
+        content, safe_filename = await asyncio.to_thread(save_uploaded_image, file)
+        if not content:
+            return jsonify({"error": "Empty file"}), 400
+
+        return image_text_response(await extract_image_text_async(file, content), safe_filename)
+    except Exception as e:
+        return image_to_text_failed(e)
+
+
 # ---------------------------
 # Run
 # ---------------------------
@@ -0,0 +1,142 @@
+"""ASGI entry point.
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT
+
+POST /ask and POST /image_to_text run as coroutines (async Gemini calls,
+translation off the event loop), so one process can hold hundreds of
+in-flight model calls. They run inside a normal Flask request context, so
+session cookies, before/after_request hooks, CORS headers and the JSON
+bodies are the same as under the WSGI server. Every other route is handed
+to the unchanged Flask app on a thread pool (WSGI_THREADS, default 32), so
+a slow blocking route does not hold up the rest.
+
+Behind a proxy, start uvicorn with --proxy-headers --forwarded-allow-ips
+so the scope already carries the client address, and set
+TRUSTED_PROXY_HOPS=0 to turn the per-IP rate limit on.
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, ask_async, image_to_text_async
+
+ASYNC_VIEWS = {
+    ("POST", "/ask"): ask_async,
+    ("POST", "/image_to_text"): image_to_text_async,
+}
+
+wsgi_pool = ThreadPoolExecutor(max_workers=int(os.getenv("WSGI_THREADS", "32")), thread_name_prefix="wsgi")
+
+
+def build_environ(scope, body):
+    """Minimal WSGI environ for an ASGI HTTP scope."""
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("ascii"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin1").upper().replace("-", "_")
+        value = raw_value.decode("latin1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is fully buffered, so its length is known even for chunked uploads
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+async def read_body(receive):
+    """Whole request body, or None if the client disconnected first."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def run_async_view(view, environ):
+    """Run a coroutine view with the same request lifecycle Flask gives sync views."""
+    with app.request_context(environ):
+        try:
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await view()
+            response = app.make_response(rv)
+            return app.process_response(response)
+        except Exception as e:
+            return app.make_response(app.handle_exception(e))
+
+
+def run_wsgi(environ):
+    """Call the Flask WSGI app in a pool thread; returns (status, headers, body)."""
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(" ", 1)[0]), headers]
+
+    result = app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started[0], started[1], body
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                wsgi_pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return  # websockets are not served
+
+    body = await read_body(receive)
+    if body is None:
+        return  # client went away mid-request; nothing to answer
+    environ = build_environ(scope, body)
+
+    view = ASYNC_VIEWS.get((scope["method"], scope["path"]))
+    if view is None:
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(wsgi_pool, run_wsgi, environ)
+    else:
+        response = await run_async_view(view, environ)
+        try:
+            status, headers, body = response.status_code, list(response.headers.items()), response.get_data()
+        finally:
+            response.close()
+
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
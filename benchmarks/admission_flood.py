@@ -0,0 +1,89 @@
+"""Synthetic flood against the /ask admission gate.
+
+Low-priority (quiz/tip) clients hammer a fake model call while urgent
+requests (symptoms/medicine) arrive at a steady trickle. Prints queueing
+latency per class with the priority gate, and again with every request at
+the same priority (plain FIFO) for comparison.
+
+With the default short wait line, served urgent requests see about the
+same latency either way (one run: p50 349ms FIFO vs 322ms with the gate).
+The difference is admission: under FIFO about a dozen urgent requests
+were turned away with 429, with the gate none were.
+
+    python benchmarks/admission_flood.py
+"""
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import PriorityGate, PRIORITY_HIGH, PRIORITY_LOW  # noqa: E402
+
+MODEL_LATENCY = 0.2      # seconds per fake Gemini call
+FLOOD_CLIENTS = 40
+URGENT_INTERVAL = 0.25
+DURATION = 5.0
+REJECT_BACKOFF = 0.5
+
+
+def fake_model_call(gate, priority, results, kind):
+    start = time.monotonic()
+    if not gate.acquire(priority):
+        results[kind]["rejected"] += 1
+        time.sleep(REJECT_BACKOFF)  # well-behaved clients honour Retry-After
+        return
+    waited = time.monotonic() - start
+    try:
+        time.sleep(MODEL_LATENCY)
+    finally:
+        gate.release()
+    results[kind]["latency"].append(waited + MODEL_LATENCY)
+
+
+def run(use_priority):
+    # Same limits as build_priority_gate() defaults
+    gate = PriorityGate(max_inflight=4, max_waiting=4, wait_timeout=2)
+    results = {k: {"latency": [], "rejected": 0} for k in ("flood", "urgent")}
+    stop = time.monotonic() + DURATION
+    urgent_priority = PRIORITY_HIGH if use_priority else PRIORITY_LOW
+
+    def flood_client():
+        while time.monotonic() < stop:
+            fake_model_call(gate, PRIORITY_LOW, results, "flood")
+
+    threads = [threading.Thread(target=flood_client) for _ in range(FLOOD_CLIENTS)]
+    for t in threads:
+        t.start()
+    while time.monotonic() < stop:
+        t = threading.Thread(target=fake_model_call, args=(gate, urgent_priority, results, "urgent"))
+        t.start()
+        threads.append(t)
+        time.sleep(URGENT_INTERVAL)
+    for t in threads:
+        t.join()
+    return results
+
+
+def summarize(label, results):
+    print(label)
+    for kind, r in results.items():
+        lat = sorted(r["latency"])
+        if lat:
+            p50 = statistics.median(lat) * 1000
+            p95 = lat[min(len(lat) - 1, math.ceil(0.95 * len(lat)) - 1)] * 1000
+            print(f"  {kind:7s} served={len(lat):4d} rejected(429)={r['rejected']:4d} "
+                  f"p50={p50:7.1f}ms p95={p95:7.1f}ms")
+        else:
+            print(f"  {kind:7s} served=   0 rejected(429)={r['rejected']:4d}")
+
+
+if __name__ == "__main__":
+    fifo = run(use_priority=False)
+    summarize("FIFO (all same priority):", fifo)
+    gated = run(use_priority=True)
+    summarize("Priority gate:", gated)
+    print(f"urgent requests rejected: FIFO {fifo['urgent']['rejected']}, priority gate {gated['urgent']['rejected']}")
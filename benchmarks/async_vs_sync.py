@@ -0,0 +1,156 @@
+"""Sync workers vs the ASGI path, against fake Gemini / translator upstreams.
+
+Each virtual user sends a few requests back to back, either to /ask (an
+async view under ASGI) or to /translate (a blocking route that ASGI hands
+to the WSGI fallback pool). The sync run pushes requests through the Flask
+WSGI app on a fixed pool of threads (standing in for gunicorn sync
+workers); the async run calls the ASGI application directly. Both use the
+same fake upstream latency, so the difference is the execution model only
+(no network or HTTP parsing).
+
+    python benchmarks/async_vs_sync.py
+"""
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USERS = (10, 100, 500)
+MESSAGES_PER_USER = 2
+UPSTREAM_LATENCY = 0.5   # seconds per fake Gemini call
+SYNC_WORKERS = 8         # e.g. gunicorn -w 4 --threads 2
+
+# Keep admission control out of the way; this measures throughput only
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_SESSION_BURST", "1000000")
+os.environ.setdefault("RATE_LIMIT_IP_BURST", "1000000")
+os.environ.setdefault("MODEL_MAX_INFLIGHT", str(SYNC_WORKERS))
+os.environ.setdefault("MODEL_MAX_INFLIGHT_ASYNC", "100000")
+
+import app as sehat  # noqa: E402
+import asgi  # noqa: E402
+
+
+class FakeTranslator:
+    def translate(self, text, **kwargs):
+        time.sleep(UPSTREAM_LATENCY)
+        return text
+
+
+class FakeResponse:
+    text = "Here are three tips. This is general advice, not a substitute for professional help."
+
+
+class FakeChat:
+    def send_message(self, prompt):
+        time.sleep(UPSTREAM_LATENCY)
+        return FakeResponse()
+
+
+class FakeModel:
+    """The async path sends its own chat history through the model."""
+
+    async def generate_content_async(self, contents):
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        return FakeResponse()
+
+
+def post_scope(user, path):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "root_path": "",
+        "query_string": b"", "headers": [(b"content-type", b"application/json")],
+        "client": (f"10.0.{user // 256}.{user % 256}", 40000), "server": ("bench", 80),
+    }
+
+
+def request_body(route, user, n):
+    if route == "/translate":
+        return json.dumps({"text": f"Hello from user {user}, message {n}", "target_language": "hi"}).encode()
+    return json.dumps({"message": f"Any diet ideas for user {user}, message {n}?"}).encode()
+
+
+def call_wsgi(environ):
+    status = []
+    body = b"".join(sehat.app.wsgi_app(environ, lambda s, h, exc=None: status.append(s)))
+    return int(status[0].split()[0]), body
+
+
+async def call_asgi(scope, body):
+    messages = []
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if delivered:
+            return {"type": "http.disconnect"}
+        delivered = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.application(scope, receive, send)
+    return messages[0]["status"], messages[1]["body"]
+
+
+async def run(users, mode, pool, route):
+    loop = asyncio.get_running_loop()
+    latencies, errors = [], 0
+
+    async def user_session(user):
+        nonlocal errors
+        for n in range(MESSAGES_PER_USER):
+            scope, body = post_scope(user, route), request_body(route, user, n)
+            start = time.perf_counter()
+            if mode == "sync":
+                environ = asgi.build_environ(scope, body)
+                status, _ = await loop.run_in_executor(pool, call_wsgi, environ)
+            else:
+                status, _ = await call_asgi(scope, body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user_session(u) for u in range(users)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)] * 1000,
+        "errors": errors,
+    }
+
+
+async def main():
+    sehat.chat = FakeChat()
+    sehat.model = FakeModel()
+    sehat.translate_client = FakeTranslator()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"upstream latency {UPSTREAM_LATENCY * 1000:.0f}ms, {MESSAGES_PER_USER} requests/user, "
+              f"sync pool {SYNC_WORKERS} workers, ASGI fallback pool {os.getenv('WSGI_THREADS', '32')} threads")
+        print(f"{'route':>10s} {'users':>5s} {'mode':>5s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'errors':>6s}")
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as pool:
+            for route in ("/ask", "/translate"):
+                for users in USERS:
+                    for mode in ("sync", "async"):
+                        # Fresh chat log per run: each turn rewrites the whole file,
+                        # so a log grown by earlier runs would skew later ones
+                        sehat.LOG_FILE = os.path.join(tmp, f"chat_log_{route.strip('/')}_{users}_{mode}.json")
+                        sehat.async_chat_history[:] = sehat.chat_primer
+                        r = await run(users, mode, pool, route)
+                        print(f"{route:>10s} {users:5d} {mode:>5s} {r['rps']:8.1f} {r['p50']:9.1f} "
+                              f"{r['p95']:9.1f} {r['errors']:6d}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
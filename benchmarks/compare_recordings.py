@@ -0,0 +1,67 @@
+"""Compare prompt sizes and latency between two call recordings.
+
+Record real traffic once with MODEL_RECORD_FILE=live.jsonl. Then replay it
+against each version with the recorded model latency, so both sides pay
+the same upstream time and differences come from the app itself:
+
+    MODEL_REPLAY_FILE=live.jsonl MODEL_REPLAY_LATENCY=1 MODEL_RECORD_FILE=old.jsonl  (old version)
+    MODEL_REPLAY_FILE=live.jsonl MODEL_REPLAY_LATENCY=1 MODEL_RECORD_FILE=new.jsonl  (new version)
+    python benchmarks/compare_recordings.py old.jsonl new.jsonl
+
+Comparing a live recording with a replay that skips the sleeps mostly
+measures the missing model latency.
+"""
+import json
+import math
+import statistics
+import sys
+from collections import defaultdict
+
+
+def load(path):
+    groups = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry["kind"] == "request":
+                groups[f"request {entry['route']}"].append(entry)
+            else:
+                groups[entry["kind"]].append(entry)
+    return groups
+
+
+def summarize(entries):
+    latency = sorted(e["latency_ms"] for e in entries)
+    tokens = [e["tokens_est"] for e in entries if "tokens_est" in e]
+    return {
+        "n": len(entries),
+        "tokens": statistics.mean(tokens) if tokens else None,
+        "p50": statistics.median(latency),
+        "p95": latency[min(len(latency) - 1, math.ceil(0.95 * len(latency)) - 1)],
+    }
+
+
+def fmt(stats):
+    if not stats:
+        return f"{'-':>33s}"
+    tokens = f"{stats['tokens']:.0f}" if stats["tokens"] is not None else "-"
+    return f"{stats['n']:5d} {tokens:>7s} {stats['p50']:9.1f} {stats['p95']:9.1f}"
+
+
+def main(paths):
+    runs = [load(p) for p in paths]
+    keys = sorted(set().union(*runs))
+    header = f"{'n':>5s} {'tok~':>7s} {'p50 ms':>9s} {'p95 ms':>9s}"
+    print(f"{'':28s}" + " | ".join(header for _ in runs))
+    for key in keys:
+        cells = [fmt(summarize(run[key]) if run.get(key) else None) for run in runs]
+        print(f"{key:28s}" + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    if not 1 <= len(sys.argv) - 1 <= 2:
+        sys.exit(__doc__)
+    main(sys.argv[1:])
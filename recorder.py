@@ -0,0 +1,293 @@
+"""Recording and offline replay of outbound model / translator calls.
+
+MODEL_RECORD_FILE  append one compact JSON line per call (prompt hash, size,
+                   token estimate, latency, response) plus one per request.
+MODEL_REPLAY_FILE  serve calls from an earlier recording instead of the
+                   network, keyed by prompt hash, so real traffic can be
+                   re-run offline against a new version of the app.
+
+MODEL_REPLAY_LATENCY  when set to 1, replayed calls sleep for their recorded
+                   latency so end-to-end timings stay comparable with the
+                   live run; otherwise they return immediately.
+
+Both may be set at once: replaying one file while recording another gives
+prompt sizes and end-to-end latency for the new version without touching
+Gemini. Replay keys on the outbound payload only: sync chat turns send
+just the new message (the ChatSession holds the history), while async
+turns send the whole history, so it is part of their key.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+
+def payload_digest(*parts):
+    """Stable sha256 over strings, bytes, lists and dicts."""
+    h = hashlib.sha256()
+
+    def feed(obj):
+        if isinstance(obj, bytes):
+            h.update(b"b%d:" % len(obj))
+            h.update(obj)
+        elif isinstance(obj, str):
+            data = obj.encode("utf-8")
+            h.update(b"s%d:" % len(data))
+            h.update(data)
+        elif isinstance(obj, dict):
+            h.update(b"{")
+            for key in sorted(obj):
+                feed(str(key))
+                feed(obj[key])
+            h.update(b"}")
+        elif isinstance(obj, (list, tuple)):
+            h.update(b"[")
+            for item in obj:
+                feed(item)
+            h.update(b"]")
+        else:
+            feed(repr(obj))
+
+    for part in parts:
+        feed(part)
+    return h.hexdigest()[:32]
+
+
+def payload_size(obj):
+    """Return (text characters, binary bytes) in an outbound payload."""
+    if isinstance(obj, str):
+        return len(obj), 0
+    if isinstance(obj, bytes):
+        return 0, len(obj)
+    chars = blob = 0
+    items = obj.values() if isinstance(obj, dict) else obj if isinstance(obj, (list, tuple)) else []
+    for item in items:
+        c, b = payload_size(item)
+        chars += c
+        blob += b
+    return chars, blob
+
+
+def estimate_tokens(chars):
+    """Rough token count (~4 characters per token for English text)."""
+    return (chars + 3) // 4
+
+
+class ReplayMiss(LookupError):
+    """No recorded response for this payload."""
+
+
+class ReplayResponse:
+    """Stand-in for a Gemini response object during replay."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class ModelRecorder:
+    """Records outbound calls and/or replays them from a previous recording."""
+
+    def __init__(self, record_path=None, replay_path=None, replay_latency=False):
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._replay = defaultdict(deque)
+        if replay_path:
+            self._load_replay(replay_path)
+
+    @property
+    def replaying(self):
+        return bool(self.replay_path)
+
+    def _load_replay(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if entry.get("kind") != "request":
+                    self._replay[(entry["kind"], entry["hash"])].append(entry)
+
+    def _next_replay(self, kind, key):
+        with self._lock:
+            entries = self._replay.get((kind, key))
+            if not entries:
+                raise ReplayMiss(f"no recorded {kind} call for {key}")
+            # Serve recordings in order; keep repeating the last one
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            with open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def _replay_entry(self, kind, key):
+        entry = self._next_replay(kind, key)
+        delay = entry.get("latency_ms", 0) / 1000 if self.replay_latency else 0
+        return entry, delay
+
+    @staticmethod
+    def _replayed(entry):
+        if entry.get("error"):
+            raise RuntimeError(entry["error"])
+        return entry.get("response")
+
+    def _record(self, kind, key, payload, start, stored, error):
+        if not self.record_path:
+            return
+        chars, blob = payload_size(payload)
+        entry = {
+            "ts": round(time.time(), 3),
+            "kind": kind,
+            "hash": key,
+            "chars": chars,
+            "tokens_est": estimate_tokens(chars),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            "response": stored,
+        }
+        if blob:
+            entry["bytes"] = blob
+        if error:
+            entry["error"] = error
+        self._append(entry)
+
+    def call(self, kind, payload, fn, as_text=None):
+        """Run fn() (or replay it) and record the exchange.
+
+        as_text turns the live result into something JSON-serialisable;
+        replayed results come back as that stored value.
+        """
+        key = payload_digest(kind, payload)
+        start = time.perf_counter()
+        stored = error = None
+        try:
+            if self.replaying:
+                entry, delay = self._replay_entry(kind, key)
+                if delay:
+                    time.sleep(delay)
+                stored = self._replayed(entry)
+                return stored
+            result = fn()
+            stored = as_text(result) if as_text else result
+            return result
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            self._record(kind, key, payload, start, stored, error)
+
+    async def call_async(self, kind, payload, fn, as_text=None):
+        """Same as call(), for a coroutine function fn."""
+        key = payload_digest(kind, payload)
+        start = time.perf_counter()
+        stored = error = None
+        try:
+            if self.replaying:
+                entry, delay = self._replay_entry(kind, key)
+                if delay:
+                    await asyncio.sleep(delay)
+                stored = self._replayed(entry)
+                return stored
+            result = await fn()
+            stored = as_text(result) if as_text else result
+            return result
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            self._record(kind, key, payload, start, stored, error)
+
+    def log_request(self, route, status, latency_ms):
+        """Record end-to-end latency of one HTTP request."""
+        if self.record_path:
+            self._append({
+                "ts": round(time.time(), 3),
+                "kind": "request",
+                "route": route,
+                "status": status,
+                "latency_ms": round(latency_ms, 2),
+            })
+
+
+def _response_text(response):
+    try:
+        return response.text
+    except Exception:
+        # .text raises when the candidate was blocked or empty
+        return None
+
+
+class RecordingChat:
+    """Wraps a Gemini ChatSession."""
+
+    def __init__(self, chat, recorder):
+        self._chat = chat
+        self._recorder = recorder
+
+    def send_message(self, content, **kwargs):
+        result = self._recorder.call(
+            "chat", content, lambda: self._chat.send_message(content, **kwargs), as_text=_response_text
+        )
+        return ReplayResponse(result) if self._recorder.replaying else result
+
+    async def send_message_async(self, content, **kwargs):
+        result = await self._recorder.call_async(
+            "chat", content, lambda: self._chat.send_message_async(content, **kwargs), as_text=_response_text
+        )
+        return ReplayResponse(result) if self._recorder.replaying else result
+
+
+class RecordingModel:
+    """Wraps a Gemini GenerativeModel."""
+
+    def __init__(self, model, recorder, kind="generate"):
+        self._model = model
+        self._recorder = recorder
+        self._kind = kind
+
+    def generate_content(self, contents, **kwargs):
+        result = self._recorder.call(
+            self._kind, contents, lambda: self._model.generate_content(contents, **kwargs), as_text=_response_text
+        )
+        return ReplayResponse(result) if self._recorder.replaying else result
+
+    async def generate_content_async(self, contents, **kwargs):
+        result = await self._recorder.call_async(
+            self._kind, contents, lambda: self._model.generate_content_async(contents, **kwargs), as_text=_response_text
+        )
+        return ReplayResponse(result) if self._recorder.replaying else result
+
+    def start_chat(self, **kwargs):
+        return RecordingChat(self._model.start_chat(**kwargs), self._recorder)
+
+
+class RecordingTranslator:
+    """Wraps the google_trans_new translator."""
+
+    def __init__(self, translator, recorder):
+        self._translator = translator
+        self._recorder = recorder
+
+    def translate(self, text, **kwargs):
+        return self._recorder.call(
+            "translate", [text, kwargs], lambda: self._translator.translate(text, **kwargs)
+        )
+
+
+def build_recorder():
+    """Recorder from MODEL_RECORD_FILE / MODEL_REPLAY_FILE, or None when both are unset."""
+    record_path = os.getenv("MODEL_RECORD_FILE") or None
+    replay_path = os.getenv("MODEL_REPLAY_FILE") or None
+    if not record_path and not replay_path:
+        return None
+    return ModelRecorder(
+        record_path=record_path,
+        replay_path=replay_path,
+        replay_latency=os.getenv("MODEL_REPLAY_LATENCY", "0") == "1",
+    )
@@ -0,0 +1,205 @@
+"""Weather-based wellness tips.
+
+Tips are precomputed per weather condition; only the condition for a city
+comes from a pluggable provider. Conditions are cached per city with a TTL:
+a fresh entry is served directly, a stale one is served immediately while a
+background refresh runs, and concurrent lookups for the same city share a
+single provider call. Only a city never seen before waits on the provider,
+and then only up to a bounded timeout. Failures are cached too (with a
+shorter TTL), so a bad city or a provider outage is retried in the
+background rather than on every request. The cache is an LRU of bounded
+size, since cities come from the request, and so is the number of cold
+lookups in flight: past it, an unknown city gets the default tip without
+a provider call.
+
+WEATHER_PROVIDER   fixture (default, offline) or openweathermap
+WEATHER_FIXTURE    JSON file of {"city": "Condition", "default": "Condition"}
+WEATHER_API_KEY    OpenWeatherMap key
+WEATHER_TTL        seconds a cached condition counts as fresh (default 900)
+WEATHER_ERROR_TTL  seconds before a failed lookup is retried (default 60)
+WEATHER_COLD_TIMEOUT  longest a cold lookup waits on the provider (default 3)
+WEATHER_CACHE_SIZE cities kept in the cache (default 256)
+WEATHER_MAX_COLD_FETCHES  cold lookups in flight at once (default 8)
+"""
+import abc
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+WEATHER_TIPS = {
+    'Clear': "It's a beautiful day! Go for a walk and get some natural sunlight. It's great for your mood and Vitamin D.",
+    'Clouds': "A cloudy day is perfect for an indoor workout. Try some light stretches or yoga to stay active.",
+    'Rain': "Stay indoors and hydrate! A warm cup of herbal tea can be very comforting on a rainy day.",
+    'Snow': "If you're going out, remember to bundle up in layers to stay warm. A hot, nutritious soup is a great way to warm up afterwards.",
+    'Mist': "Visibility is low. If you're driving, be extra careful. Inside, take some time for mindfulness and deep breathing.",
+    'default': "The weather is changing. Remember to drink plenty of water and eat a balanced meal to keep your immune system strong."
+}
+
+# Conditions that take another condition's tip
+CONDITION_ALIASES = {"Drizzle": "Rain", "Thunderstorm": "Rain", "Haze": "Mist", "Fog": "Mist", "Smoke": "Mist"}
+
+
+def tip_for_condition(condition):
+    condition = CONDITION_ALIASES.get(condition, condition)
+    return WEATHER_TIPS.get(condition, WEATHER_TIPS['default'])
+
+
+class WeatherProvider(abc.ABC):
+    """Returns the main weather condition (e.g. 'Clear', 'Rain') for a city."""
+
+    @abc.abstractmethod
+    def current_condition(self, city):
+        """Condition for city; raises on failure."""
+
+
+class FixtureWeatherProvider(WeatherProvider):
+    """Offline provider backed by a JSON file of city -> condition."""
+
+    def __init__(self, path=None, conditions=None):
+        self.conditions = {"default": "Clear"}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.conditions.update(json.load(f))
+        if conditions:
+            self.conditions.update(conditions)
+        self.conditions = {k.strip().lower(): v for k, v in self.conditions.items()}
+
+    def current_condition(self, city):
+        return self.conditions.get((city or "").lower(), self.conditions["default"])
+
+
+class OpenWeatherMapProvider(WeatherProvider):
+    """Current conditions from the OpenWeatherMap REST API."""
+
+    URL = "https://api.openweathermap.org/data/2.5/weather"
+
+    def __init__(self, api_key, timeout=3):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def current_condition(self, city):
+        if not city:
+            raise ValueError("city is required")
+        query = urllib.parse.urlencode({"q": city, "appid": self.api_key})
+        with urllib.request.urlopen(f"{self.URL}?{query}", timeout=self.timeout) as resp:
+            data = json.load(resp)
+        return data['weather'][0]['main']
+
+
+class WeatherTipService:
+    """Per-city cached conditions with stale-while-revalidate refresh."""
+
+    def __init__(self, provider, ttl=900, error_ttl=60, cold_timeout=3, max_entries=256, max_workers=4,
+                 max_cold_fetches=8):
+        self.provider = provider
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.cold_timeout = cold_timeout
+        self.max_entries = max_entries
+        self.max_cold_fetches = max_cold_fetches
+        self._cache = OrderedDict()  # city -> (condition or None, expires_at), LRU order
+        self._inflight = {}          # city -> Future, shared by concurrent lookups
+        self._cold = set()           # in-flight cities requested before they were cached
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather")
+
+    def _store(self, city, condition, ttl):
+        with self._lock:
+            self._cache[city] = (condition, time.monotonic() + ttl)
+            self._cache.move_to_end(city)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, city):
+        try:
+            condition = self.provider.current_condition(city)
+            self._store(city, condition, self.ttl)
+            return condition
+        except Exception as e:
+            print(f"Weather provider error ({city or 'no city'}): {e}")
+            # Keep serving the last good condition (or None) and back off
+            with self._lock:
+                previous = self._cache.get(city, (None, 0))[0]
+            self._store(city, previous, self.error_ttl)
+            return previous
+        finally:
+            with self._lock:
+                self._inflight.pop(city, None)
+                self._cold.discard(city)
+
+    def _refresh(self, city, cold=False):
+        """Start a provider call for city unless one is already running.
+
+        Returns None instead when a cold lookup would go over max_cold_fetches.
+        """
+        with self._lock:
+            future = self._inflight.get(city)
+            if future is None:
+                if cold:
+                    if len(self._cold) >= self.max_cold_fetches:
+                        return None
+                    self._cold.add(city)
+                future = self._executor.submit(self._fetch, city)
+                self._inflight[city] = future
+            return future
+
+    def prefetch(self, city):
+        """Warm the cache for a city in the background."""
+        self._refresh(normalize_city(city))
+
+    def get_condition(self, city):
+        """Cached condition for city; None when unknown, failed or still loading."""
+        city = normalize_city(city)
+        with self._lock:
+            cached = self._cache.get(city)
+            if cached:
+                self._cache.move_to_end(city)
+        if cached:
+            condition, expires_at = cached
+            if time.monotonic() >= expires_at:
+                self._refresh(city)  # serve stale, revalidate in the background
+            return condition
+        future = self._refresh(city, cold=True)
+        if future is None:
+            return None  # too many unknown cities loading already
+        try:
+            return future.result(timeout=self.cold_timeout)
+        except FutureTimeout:
+            return None  # the fetch keeps running and fills the cache
+
+    def get_tip(self, city):
+        """Returns (condition, tip)."""
+        condition = self.get_condition(city)
+        return condition, tip_for_condition(condition)
+
+
+def normalize_city(city):
+    return (city or "").strip().lower()
+
+
+def build_weather_service():
+    """Build the tip service from environment settings."""
+    provider_name = os.getenv("WEATHER_PROVIDER", "fixture").lower()
+    cold_timeout = float(os.getenv("WEATHER_COLD_TIMEOUT", "3"))
+    if provider_name == "openweathermap":
+        api_key = os.getenv("WEATHER_API_KEY")
+        if not api_key:
+            raise ValueError("⚠️ WEATHER_API_KEY is not set.")
+        # A provider call never outlives the wait of a cold lookup
+        provider = OpenWeatherMapProvider(api_key, timeout=cold_timeout)
+    else:
+        fixture = os.getenv("WEATHER_FIXTURE", os.path.join(os.path.dirname(__file__), "weather_fixture.json"))
+        provider = FixtureWeatherProvider(fixture)
+    return WeatherTipService(
+        provider,
+        ttl=float(os.getenv("WEATHER_TTL", "900")),
+        error_ttl=float(os.getenv("WEATHER_ERROR_TTL", "60")),
+        cold_timeout=cold_timeout,
+        max_entries=int(os.getenv("WEATHER_CACHE_SIZE", "256")),
+        max_cold_fetches=int(os.getenv("WEATHER_MAX_COLD_FETCHES", "8")),
+    )